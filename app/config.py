@@ -9,6 +9,8 @@ class Settings(BaseSettings):
     
     # API Keys
     GEMINI_API_KEY: str = os.getenv("GEMINI_API_KEY", "")
+    # Sent as X-Admin-Token to call admin endpoints; unset disables them
+    ADMIN_TOKEN: str = os.getenv("ADMIN_TOKEN", "")
     
     # Paths
     DATA_DIR: str = os.path.join(os.path.dirname(__file__), '..', '..', 'data')
@@ -19,6 +21,12 @@ class Settings(BaseSettings):
     API_VERSION: str = "1.0.0"
     API_DESCRIPTION: str = "AI-powered tour guide for Bangladesh"
     
+    # Logging (INFO shows ingest/embedding progress)
+    LOG_LEVEL: str = "WARNING"
+    
+    # Seconds a generated tour-guide reply is reused for the same query and spots
+    RAG_CACHE_TTL: int = 3600
+    
     # CORS
     CORS_ORIGINS: list = ["*"]  # Update in production
     
@@ -29,4 +37,17 @@ settings = Settings()
 EMBED_MODEL = "gemini-embedding-001"  # latest free embedding model
 LLM_MODEL = "gemini-2.0-flash"           # latest free chat model
 TOP_K = 5                                # number of relevant spots to retrieve
-FAISS_INDEX_PATH = "../data/faiss_index"
\ No newline at end of file
+FAISS_INDEX_PATH = "../data/faiss_index"
+EMBED_CACHE_PATH = "../data/embedding_cache.npz"  # text hash -> embedding, reused across runs
+EMBED_BATCH_SIZE = 100                   # texts per embed_content call (API max is 100)
+EMBED_WORKERS = 4                        # embedding batches in flight at once
+EMBED_REQUESTS_PER_MINUTE = 100          # stay under the Gemini embedding rate limit
+HNSW_M = 32                              # neighbours per node in the HNSW graph
+HNSW_EF_CONSTRUCTION = 80                # build-time search depth (higher = better graph)
+HNSW_EF_SEARCH = 32                      # query-time search depth (higher = better recall)
+SEMANTIC_CACHE_THRESHOLD = 0.95          # cosine similarity needed to reuse a cached answer
+SEMANTIC_CACHE_TTL = 3600                # seconds a cached answer stays valid
+SEMANTIC_CACHE_SIZE = 1024               # max cached queries (LRU eviction)
+RAG_CACHE_SIZE = 2048                    # max cached tour-guide replies (LRU eviction)
+GEMINI_CONCURRENCY = 32                  # max Gemini generate calls in flight at once
+GEMINI_MAX_ATTEMPTS = 3                  # tries per Gemini call on 429/5xx (exponential backoff)
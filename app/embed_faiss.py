@@ -1,50 +1,128 @@
-import json
+import time
+import hashlib
+import logging
+import threading
+import orjson
 import faiss
 import numpy as np
 import google.generativeai as genai
 from pathlib import Path
-from app.config import settings, EMBED_MODEL, FAISS_INDEX_PATH
+from concurrent.futures import ThreadPoolExecutor
+from app.config import (
+    settings, EMBED_MODEL, FAISS_INDEX_PATH, EMBED_CACHE_PATH, HNSW_M, HNSW_EF_CONSTRUCTION,
+    EMBED_BATCH_SIZE, EMBED_WORKERS, EMBED_REQUESTS_PER_MINUTE
+)
+
+logger = logging.getLogger(__name__)
 
 # Configure Gemini
 genai.configure(api_key=settings.GEMINI_API_KEY)
 
+
+class RateLimiter:
+    """Spaces out calls across threads so at most `per_minute` start each minute"""
+
+    def __init__(self, per_minute: int):
+        self.interval = 60.0 / per_minute
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def embed_batch(batch, limiter: RateLimiter):
+    """Embed one batch of document texts, always returning a list of vectors"""
+    limiter.wait()
+    result = genai.embed_content(
+        model=EMBED_MODEL,
+        content=batch,
+        task_type="retrieval_document"
+    )
+    return result["embedding"] if isinstance(result["embedding"][0], list) else [result["embedding"]]
+
+
+def text_key(text: str) -> str:
+    """Cache key for a document text; includes the model so switching models re-embeds"""
+    return hashlib.blake2b(f"{EMBED_MODEL}\n{text}".encode("utf-8"), digest_size=16).hexdigest()
+
+
+def load_embedding_cache(path: str = EMBED_CACHE_PATH) -> dict:
+    """Load the {text key: embedding} sidecar written by a previous run"""
+    if not Path(path).exists():
+        return {}
+    with np.load(path) as data:
+        return dict(zip(data["keys"].tolist(), data["embeddings"]))
+
+
+def save_embedding_cache(cache: dict, path: str = EMBED_CACHE_PATH):
+    if not cache:
+        return
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    np.savez(path, keys=np.array(list(cache)), embeddings=np.stack(list(cache.values())))
+
+
 def create_embeddings():
     # Load tourist spot data
-    with open("../data/places.json", "r", encoding="utf-8") as f:
-        places = json.load(f)
+    places = orjson.loads(Path("../data/places.json").read_bytes())
+
+    logger.info(f"📚 Loaded {len(places)} places for embedding...")
+
+    # Only places with a description are indexed; row i of the index is documents[i]
+    documents = [p for p in places if p.get("description")]
+    texts = [f"{p['name']}: {p['description']}" for p in documents]
+    keys = [text_key(t) for t in texts]
 
-    print(f"📚 Loaded {len(places)} places for embedding...")
+    # Reuse embeddings from earlier runs and embed each new distinct text once
+    cache = load_embedding_cache()
+    missing = {}
+    for key, text in zip(keys, texts):
+        if key not in cache:
+            missing.setdefault(key, text)
 
-    texts = [f"{p['name']}: {p['description']}" for p in places if p.get("description")]
-    embeddings = []
+    pending = list(missing.values())
+    batches = [pending[i:i + EMBED_BATCH_SIZE] for i in range(0, len(pending), EMBED_BATCH_SIZE)]
+    logger.info(f"Embedding {len(pending)} new texts in {len(batches)} batches "
+                f"({len(texts) - len(pending)} reused from cache)...")
 
-    batch_size = 10
-    for i in range(0, len(texts), batch_size):
-        batch = texts[i:i + batch_size]
-        print(f"Embedding batch {i // batch_size + 1}/{(len(texts) // batch_size) + 1}")
+    # Calls are network-bound, so a few threads overlap the waits; map keeps batch order
+    limiter = RateLimiter(EMBED_REQUESTS_PER_MINUTE)
+    with ThreadPoolExecutor(max_workers=EMBED_WORKERS) as ex:
+        results = list(ex.map(lambda batch: embed_batch(batch, limiter), batches))
+    new_embeddings = [vector for batch_embeddings in results for vector in batch_embeddings]
+    cache.update(zip(missing, np.asarray(new_embeddings, dtype=np.float32)))
 
-        result = genai.embed_content(
-            model=EMBED_MODEL,
-            content=batch,
-            task_type="retrieval_document"
-        )
-        batch_embeddings = result["embedding"] if isinstance(result["embedding"][0], list) else [result["embedding"]]
-        embeddings.extend(batch_embeddings)
+    # Keep only what the current dataset uses so the sidecar doesn't grow forever
+    cache = {key: cache[key] for key in keys}
+    save_embedding_cache(cache)
 
-    embeddings = np.array(embeddings, dtype="float32")
+    # FAISS wants C-contiguous float32, otherwise SWIG copies (or rejects) the matrix
+    embeddings = np.ascontiguousarray([cache[key] for key in keys], dtype=np.float32)
+    assert embeddings.flags["C_CONTIGUOUS"]
     dim = embeddings.shape[1]
 
-    # Create FAISS index
-    index = faiss.IndexFlatL2(dim)
+    # Create FAISS index: HNSW graph over unit vectors, so inner product = cosine.
+    # Vectors are stored as 8-bit scalar-quantized codes (4x smaller than float32);
+    # training just learns the per-dimension value ranges.
+    faiss.normalize_L2(embeddings)
+    index = faiss.IndexHNSWSQ(dim, faiss.ScalarQuantizer.QT_8bit, HNSW_M, faiss.METRIC_INNER_PRODUCT)
+    index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+    index.train(embeddings)
     index.add(embeddings)
 
     Path(FAISS_INDEX_PATH).parent.mkdir(parents=True, exist_ok=True)
     faiss.write_index(index, FAISS_INDEX_PATH)
 
-    with open("../data/place_mapping.json", "w", encoding="utf-8") as f:
-        json.dump(places, f, ensure_ascii=False, indent=2)
+    with open("../data/place_mapping.json", "wb") as f:
+        f.write(orjson.dumps(documents, option=orjson.OPT_INDENT_2))
 
-    print(f"✅ FAISS index created with {len(places)} places at {FAISS_INDEX_PATH}")
+    logger.info(f"✅ FAISS index created with {len(documents)} places at {FAISS_INDEX_PATH}")
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     create_embeddings()
@@ -1,10 +1,18 @@
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
+import aiohttp
+import asyncio
 from bs4 import BeautifulSoup
-import json
+import orjson
 import re
 import time
+import logging
+from bisect import bisect_right
 from pathlib import Path
-from tqdm import tqdm
+from tqdm.asyncio import tqdm_asyncio
+
+logger = logging.getLogger(__name__)
 
 # -------------------- CONFIG --------------------
 BANG_URL = "https://en.banglapedia.org"
@@ -12,132 +20,154 @@ BANG_SEARCH = BANG_URL + "/index.php"
 WIKI_URL = "https://en.wikipedia.org"
 DIVISIONS = ["Dhaka", "Chittagong", "Khulna", "Sylhet", "Barisal", "Rajshahi", "Rangpur", "Mymensingh"]
 HEADERS = {"User-Agent": "Mozilla/5.0"}
+FETCH_CONCURRENCY = 8  # max detail pages fetched at once
+REF_RE = re.compile(r"\[[^\]\n]*\]")  # "[1]"-style references; same matches as r"\[.*?\]" without backtracking
+
+# One pooled keep-alive session for the search requests, so repeat calls to the
+# same host skip the TCP + TLS handshake (detail pages go through aiohttp)
+SESSION = requests.Session()
+SESSION.headers.update(HEADERS)
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=16,
+    pool_maxsize=32,
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[502, 503, 504])
+))
 
 # -------------------- ENHANCED DIVISION ASSIGNMENT --------------------
+DIVISION_KEYWORDS = {
+    "Dhaka": {
+        "exact": ["dhaka"],
+        "keywords": ["buriganga", "lalbagh", "ahsan manzil", "national museum", 
+                    "shahbag", "ramna", "dhanmondi", "gulshan", "uttara",
+                    "old dhaka", "sadarghat"],
+    },
+    "Chittagong": {
+        "exact": ["chittagong", "chattogram"],
+        "keywords": ["cox's bazar", "cox bazar", "coxs bazar", "patenga", 
+                    "foy's lake", "kaptai", "rangamati", "khagrachari",
+                    "bandarban", "sitakunda", "mirsharai"],
+    },
+    "Khulna": {
+        "exact": ["khulna"],
+        "keywords": ["sundarbans", "sundarban", "bagerhat", "mongla", 
+                    "kuakata", "satkhira"],
+    },
+    "Sylhet": {
+        "exact": ["sylhet"],
+        "keywords": ["ratargul", "jaflong", "madhabkunda", "lalakhal", 
+                    "srimangal", "sreemangal", "tea garden", "tamabil"],
+    },
+    "Barisal": {
+        "exact": ["barisal", "barishal"],
+        "keywords": ["kuakata", "durga sagar", "patuakhali", "bhola"],
+    },
+    "Rajshahi": {
+        "exact": ["rajshahi"],
+        "keywords": ["paharpur", "bagha", "puthia", "varendra", "natore"],
+    },
+    "Rangpur": {
+        "exact": ["rangpur"],
+        "keywords": ["tetulia", "nilphamari", "dinajpur", "kantaji"],
+    },
+    "Mymensingh": {
+        "exact": ["mymensingh"],
+        "keywords": ["shashi lake", "brahmaputra", "jamalpur"],
+    }
+}
+
+def _compile_any(keywords):
+    """One alternation regex per keyword group: a single .search() instead of a substring loop"""
+    return re.compile("|".join(map(re.escape, keywords)))
+
+DIVISION_EXACT_RE = {div: _compile_any(p["exact"]) for div, p in DIVISION_KEYWORDS.items()}
+DIVISION_KEYWORD_RE = {div: _compile_any(p["keywords"]) for div, p in DIVISION_KEYWORDS.items()}
+
+def _join_texts(texts):
+    """Join texts with newlines (no keyword spans one) and record where each text starts"""
+    starts, pos = [], 0
+    for text in texts:
+        starts.append(pos)
+        pos += len(text) + 1
+    return "\n".join(texts), starts
+
+def _matching_indices(regex, corpus, starts):
+    """
+    Indices of the joined texts that contain a match. The regex scans the whole
+    corpus in C and jumps to the next text after each hit, so there is one
+    search call per matching text instead of one per text.
+    """
+    hits = []
+    m = regex.search(corpus)
+    while m:
+        i = bisect_right(starts, m.start()) - 1
+        hits.append(i)
+        if i + 1 >= len(starts):
+            break
+        m = regex.search(corpus, starts[i + 1])
+    return hits
+
 def assign_divisions(places):
     """
     Enhanced division assignment with better keyword matching
     """
-    division_keywords = {
-        "Dhaka": {
-            "exact": ["dhaka"],
-            "keywords": ["buriganga", "lalbagh", "ahsan manzil", "national museum", 
-                        "shahbag", "ramna", "dhanmondi", "gulshan", "uttara",
-                        "old dhaka", "sadarghat"],
-        },
-        "Chittagong": {
-            "exact": ["chittagong", "chattogram"],
-            "keywords": ["cox's bazar", "cox bazar", "coxs bazar", "patenga", 
-                        "foy's lake", "kaptai", "rangamati", "khagrachari",
-                        "bandarban", "sitakunda", "mirsharai"],
-        },
-        "Khulna": {
-            "exact": ["khulna"],
-            "keywords": ["sundarbans", "sundarban", "bagerhat", "mongla", 
-                        "kuakata", "satkhira"],
-        },
-        "Sylhet": {
-            "exact": ["sylhet"],
-            "keywords": ["ratargul", "jaflong", "madhabkunda", "lalakhal", 
-                        "srimangal", "sreemangal", "tea garden", "tamabil"],
-        },
-        "Barisal": {
-            "exact": ["barisal", "barishal"],
-            "keywords": ["kuakata", "durga sagar", "patuakhali", "bhola"],
-        },
-        "Rajshahi": {
-            "exact": ["rajshahi"],
-            "keywords": ["paharpur", "bagha", "puthia", "varendra", "natore"],
-        },
-        "Rangpur": {
-            "exact": ["rangpur"],
-            "keywords": ["tetulia", "nilphamari", "dinajpur", "kantaji"],
-        },
-        "Mymensingh": {
-            "exact": ["mymensingh"],
-            "keywords": ["shashi lake", "brahmaputra", "jamalpur"],
-        }
-    }
-
-    for place in places:
-        if not place.get("division") or place.get("division") == "Unknown":
-            desc = (place.get("description") or "").lower()
-            name = (place.get("name") or "").lower()
-            url = (place.get("url") or "").lower()
-            
-            combined_text = f"{name} {desc} {url}"
-            assigned = False
-            
-            # First try exact matches in name (highest priority)
-            for div, patterns in division_keywords.items():
-                for exact in patterns["exact"]:
-                    if exact in name:
-                        place["division"] = div
-                        assigned = True
-                        break
-                if assigned:
-                    break
-            
-            # Then try exact matches in URL
-            if not assigned:
-                for div, patterns in division_keywords.items():
-                    for exact in patterns["exact"]:
-                        if exact in url:
-                            place["division"] = div
-                            assigned = True
-                            break
-                    if assigned:
-                        break
-            
-            # Then try keywords anywhere
-            if not assigned:
-                for div, patterns in division_keywords.items():
-                    for kw in patterns["keywords"]:
-                        if kw in combined_text:
-                            place["division"] = div
-                            assigned = True
-                            break
-                    if assigned:
-                        break
-            
-            # Still not assigned? Keep as Unknown
-            if not assigned:
-                place["division"] = "Unknown"
+    pending = [p for p in places if not p.get("division") or p.get("division") == "Unknown"]
+    names = [(p.get("name") or "").lower() for p in pending]
+    urls = [(p.get("url") or "").lower() for p in pending]
+    combined = [
+        f"{name} {(p.get('description') or '').lower()} {url}"
+        for p, name, url in zip(pending, names, urls)
+    ]
+    
+    # Exact matches in name first (highest priority), then in URL, then keywords
+    # anywhere; within each pass the first division in DIVISION_KEYWORDS order wins
+    assigned = [None] * len(pending)
+    for regexes, texts in ((DIVISION_EXACT_RE, names), (DIVISION_EXACT_RE, urls),
+                           (DIVISION_KEYWORD_RE, combined)):
+        corpus, starts = _join_texts(texts)
+        for div, regex in regexes.items():
+            for i in _matching_indices(regex, corpus, starts):
+                if assigned[i] is None:
+                    assigned[i] = div
+    
+    # Still not assigned? Keep as Unknown
+    for place, div in zip(pending, assigned):
+        place["division"] = div or "Unknown"
     
     return places
 
 # -------------------- CATEGORY ASSIGNMENT --------------------
+CATEGORY_KEYWORDS = {
+    "Beach": ["beach", "sea", "ocean", "coast", "marine"],
+    "Hill": ["hill", "mountain", "highland", "valley"],
+    "Lake": ["lake", "water", "reservoir"],
+    "Forest": ["forest", "jungle", "wildlife", "sanctuary", "mangrove"],
+    "Historical": ["historical", "ancient", "heritage", "archaeological", "monument", "fort", "palace"],
+    "Religious": ["mosque", "temple", "church", "monastery", "shrine", "religious"],
+    "Park": ["park", "garden", "botanical"],
+    "Waterfall": ["waterfall", "fall", "cascade"],
+    "Island": ["island", "char"],
+    "Tea Garden": ["tea", "garden", "estate"],
+    "Museum": ["museum", "gallery"],
+    "River": ["river", "ghat"]
+}
+
+CATEGORY_RE = {category: _compile_any(keywords) for category, keywords in CATEGORY_KEYWORDS.items()}
+
 def assign_categories(places):
     """
     Assign categories to places based on their content
     """
-    category_keywords = {
-        "Beach": ["beach", "sea", "ocean", "coast", "marine"],
-        "Hill": ["hill", "mountain", "highland", "valley"],
-        "Lake": ["lake", "water", "reservoir"],
-        "Forest": ["forest", "jungle", "wildlife", "sanctuary", "mangrove"],
-        "Historical": ["historical", "ancient", "heritage", "archaeological", "monument", "fort", "palace"],
-        "Religious": ["mosque", "temple", "church", "monastery", "shrine", "religious"],
-        "Park": ["park", "garden", "botanical"],
-        "Waterfall": ["waterfall", "fall", "cascade"],
-        "Island": ["island", "char"],
-        "Tea Garden": ["tea", "garden", "estate"],
-        "Museum": ["museum", "gallery"],
-        "River": ["river", "ghat"]
-    }
+    corpus, starts = _join_texts([
+        f"{(p.get('name') or '').lower()} {(p.get('description') or '').lower()}"
+        for p in places
+    ])
     
-    for place in places:
-        desc = (place.get("description") or "").lower()
-        name = (place.get("name") or "").lower()
-        combined = f"{name} {desc}"
-        
-        categories = []
-        for category, keywords in category_keywords.items():
-            for keyword in keywords:
-                if keyword in combined:
-                    categories.append(category)
-                    break
-        
+    place_categories = [[] for _ in places]
+    for category, regex in CATEGORY_RE.items():
+        for i in _matching_indices(regex, corpus, starts):
+            place_categories[i].append(category)
+    
+    for place, categories in zip(places, place_categories):
         place["categories"] = categories if categories else ["General"]
     
     return places
@@ -147,11 +177,11 @@ def search_banglapedia(division):
     """Search Banglapedia for tourist spots in a given division."""
     query = f"tourist spot {division}"
     try:
-        resp = requests.get(BANG_SEARCH, params={"search": query}, headers=HEADERS, timeout=10)
+        resp = SESSION.get(BANG_SEARCH, params={"search": query}, timeout=10)
         if resp.status_code != 200:
-            print(f"⚠️ Search failed for {division} (status {resp.status_code})")
+            logger.warning(f"⚠️ Search failed for {division} (status {resp.status_code})")
             return []
-        soup = BeautifulSoup(resp.text, "html.parser")
+        soup = BeautifulSoup(resp.content, "lxml")
         results = soup.select("ul.mw-search-results li")
         places = []
         for r in results:
@@ -165,18 +195,18 @@ def search_banglapedia(division):
             places.append({"name": name, "url": href, "division": division})
         return places
     except Exception as e:
-        print(f"❌ Error searching Banglapedia for {division}: {e}")
+        logger.warning(f"❌ Error searching Banglapedia for {division}: {e}")
         return []
 
 def search_wikipedia():
     """Scrape Wikipedia category page for tourist attractions in Bangladesh."""
     url = WIKI_URL + "/wiki/Category:Tourist_attractions_in_Bangladesh"
     try:
-        resp = requests.get(url, headers=HEADERS, timeout=10)
+        resp = SESSION.get(url, timeout=10)
         if resp.status_code != 200:
-            print("⚠️ Wikipedia search failed")
+            logger.warning("⚠️ Wikipedia search failed")
             return []
-        soup = BeautifulSoup(resp.text, "html.parser")
+        soup = BeautifulSoup(resp.content, "lxml")
         links = soup.select("div.mw-category a")
         places = []
         for link in links:
@@ -187,16 +217,20 @@ def search_wikipedia():
                 places.append({"name": name, "url": full_url, "division": None})
         return places
     except Exception as e:
-        print(f"❌ Error searching Wikipedia: {e}")
+        logger.warning(f"❌ Error searching Wikipedia: {e}")
         return []
 
-def fetch_details(place, source="banglapedia"):
+async def fetch_details(session, place, sem, source="banglapedia"):
     """Fetch description and image from a page (Banglapedia or Wikipedia)."""
     try:
-        resp = requests.get(place["url"], headers=HEADERS, timeout=15)
-        if resp.status_code != 200:
-            return None
-        soup = BeautifulSoup(resp.text, "html.parser")
+        async with sem:
+            async with session.get(place["url"], timeout=aiohttp.ClientTimeout(total=15)) as resp:
+                if resp.status != 200:
+                    return None
+                content = await resp.read()
+            await asyncio.sleep(0.5)  # Be nice to the server
+        # Raw bytes let lxml detect the page encoding itself
+        soup = BeautifulSoup(content, "lxml")
 
         # Extract first paragraphs as description
         paras = soup.select("div.mw-parser-output > p")
@@ -207,7 +241,7 @@ def fetch_details(place, source="banglapedia"):
                 desc_parts.append(text)
         
         desc = " ".join(desc_parts)
-        desc = re.sub(r"\[.*?\]", "", desc)  # Remove references
+        desc = REF_RE.sub("", desc)  # Remove references
 
         # Extract image
         img_tag = soup.select_one("div.mw-parser-output img, img.thumbimage")
@@ -226,96 +260,106 @@ def fetch_details(place, source="banglapedia"):
         place["image"] = img_url
         return place
     except Exception as e:
-        print(f"❌ Error fetching {place.get('name')}: {e}")
+        logger.warning(f"❌ Error fetching {place.get('name')}: {e}")
         return None
 
+async def fetch_all_details(places, source="banglapedia", desc="Fetching details"):
+    """Fetch details for many pages concurrently, keeping only those with a description."""
+    sem = asyncio.Semaphore(FETCH_CONCURRENCY)
+    async with aiohttp.ClientSession(headers=HEADERS) as session:
+        results = await tqdm_asyncio.gather(
+            *[fetch_details(session, p, sem, source=source) for p in places],
+            desc=desc,
+            disable=not logger.isEnabledFor(logging.INFO)
+        )
+    return [d for d in results if d and d.get("description")]
+
 # -------------------- MAIN SCRAPER --------------------
 def scrape_all():
     all_places = []
 
     # Banglapedia
-    print("\n" + "="*50)
-    print("🌍 SCRAPING BANGLAPEDIA")
-    print("="*50)
+    logger.info("\n" + "="*50)
+    logger.info("🌍 SCRAPING BANGLAPEDIA")
+    logger.info("="*50)
     for div in DIVISIONS:
-        print(f"\n📍 Searching {div}...")
+        logger.info(f"\n📍 Searching {div}...")
         results = search_banglapedia(div)
-        print(f"   ➜ Found {len(results)} results")
+        logger.info(f"   ➜ Found {len(results)} results")
         
-        for p in tqdm(results, desc=f"Fetching details for {div}"):
-            d = fetch_details(p, source="banglapedia")
-            if d and d.get("description"):  # Only add if has description
-                all_places.append(d)
-            time.sleep(0.5)  # Be nice to the server
+        # Only keeps places that have a description
+        all_places.extend(asyncio.run(
+            fetch_all_details(results, source="banglapedia", desc=f"Fetching details for {div}")
+        ))
         
         time.sleep(1)
 
     # Wikipedia
-    print("\n" + "="*50)
-    print("📘 SCRAPING WIKIPEDIA")
-    print("="*50)
+    logger.info("\n" + "="*50)
+    logger.info("📘 SCRAPING WIKIPEDIA")
+    logger.info("="*50)
     wiki_places = search_wikipedia()
-    print(f"   ➜ Found {len(wiki_places)} wiki-spots")
+    logger.info(f"   ➜ Found {len(wiki_places)} wiki-spots")
     
-    for p in tqdm(wiki_places, desc="Fetching wiki details"):
-        d = fetch_details(p, source="wiki")
-        if d and d.get("description"):
-            all_places.append(d)
-        time.sleep(0.5)
+    all_places.extend(asyncio.run(
+        fetch_all_details(wiki_places, source="wiki", desc="Fetching wiki details")
+    ))
 
     # Deduplicate by name (case-insensitive)
-    print("\n🔄 Deduplicating...")
-    seen = {}
+    logger.info("\n🔄 Deduplicating...")
+    seen = {}  # name key -> index into unique_places
     unique_places = []
     for p in all_places:
         name_key = p["name"].lower().strip()
-        if name_key not in seen:
-            seen[name_key] = True
+        existing_idx = seen.get(name_key)
+        if existing_idx is None:
+            seen[name_key] = len(unique_places)
             unique_places.append(p)
         else:
             # If duplicate, merge information (keep the one with more description)
-            existing_idx = next(i for i, x in enumerate(unique_places) if x["name"].lower().strip() == name_key)
             if len(p.get("description", "")) > len(unique_places[existing_idx].get("description", "")):
                 unique_places[existing_idx] = p
 
-    print(f"   ➜ {len(all_places)} total → {len(unique_places)} unique")
+    logger.info(f"   ➜ {len(all_places)} total → {len(unique_places)} unique")
 
     # Assign divisions and categories
-    print("\n🏷️ Assigning divisions and categories...")
+    logger.info("\n🏷️ Assigning divisions and categories...")
     unique_places = assign_divisions(unique_places)
     unique_places = assign_categories(unique_places)
     
-    # Print statistics
-    print("\n📊 STATISTICS:")
-    division_counts = {}
-    for p in unique_places:
-        div = p.get("division", "Unknown")
-        division_counts[div] = division_counts.get(div, 0) + 1
-    
-    for div, count in sorted(division_counts.items()):
-        print(f"   {div}: {count} places")
+    # Print statistics (skip counting entirely when INFO is off)
+    if logger.isEnabledFor(logging.INFO):
+        logger.info("\n📊 STATISTICS:")
+        division_counts = {}
+        for p in unique_places:
+            div = p.get("division", "Unknown")
+            division_counts[div] = division_counts.get(div, 0) + 1
+        
+        for div, count in sorted(division_counts.items()):
+            logger.info(f"   {div}: {count} places")
 
     return unique_places
 
 def save_to_json(data, path="../data/places.json"):
     Path(path).parent.mkdir(parents=True, exist_ok=True)
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-    print(f"\n✅ Saved {len(data)} places to {path}")
+    with open(path, "wb") as f:
+        f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+    logger.info(f"\n✅ Saved {len(data)} places to {path}")
 
 def ingest_data():
     """Main function to run data ingestion"""
-    print("\n🚀 Starting BD Tour Guide Data Ingestion...")
-    print(f"⏰ Started at: {time.strftime('%Y-%m-%d %H:%M:%S')}\n")
+    logger.info("\n🚀 Starting BD Tour Guide Data Ingestion...")
+    logger.info(f"⏰ Started at: {time.strftime('%Y-%m-%d %H:%M:%S')}\n")
     
     start_time = time.time()
     data = scrape_all()
     save_to_json(data)
     
     elapsed = time.time() - start_time
-    print(f"\n⏱️ Total time: {elapsed:.2f} seconds")
-    print("🎉 Data ingestion complete!\n")
+    logger.info(f"\n⏱️ Total time: {elapsed:.2f} seconds")
+    logger.info("🎉 Data ingestion complete!\n")
 
 # -------------------- RUN --------------------
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     ingest_data()
\ No newline at end of file
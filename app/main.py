@@ -1,16 +1,44 @@
 # app/main.py
-from fastapi import FastAPI, HTTPException
+import asyncio
+import logging
+import secrets
+import orjson
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Header
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
+from google.api_core.exceptions import GoogleAPIError
 from typing import Dict, Any
 from app.models import TourQuery, TourResponse
-from app.rag import get_tour_suggestions, extract_location_info, filter_and_rank_places, generate_friendly_response, load_places_data
+from app.rag import get_tour_suggestions, stream_tour_suggestions, extract_location_info, filter_and_rank_places, generate_friendly_response, load_places_index, reload_places_data
 from app.config import settings
+from app.semantic_cache import SemanticCache, embed_query
+from app.utils import open_session, close_session
+
+logging.basicConfig(level=settings.LOG_LEVEL)
+
+
+class ORJSONResponse(JSONResponse):
+    """JSONResponse serialized with orjson (fastapi.responses.ORJSONResponse is deprecated)"""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pooled HTTP session for outbound Gemini calls
+    await open_session()
+    yield
+    await close_session()
+
 
 app = FastAPI(
     title=settings.API_TITLE,
     description=settings.API_DESCRIPTION,
-    version=settings.API_VERSION
+    version=settings.API_VERSION,
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
 # CORS middleware
@@ -22,6 +50,37 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# /api/query responses for previously seen (or near-duplicate) queries, partitioned
+# by the parsed (location, type, count) so "dhaka" never answers "khulna"
+query_cache = SemanticCache()
+_cached_index = None  # places index the query_cache answers were built from
+
+
+def _places_index():
+    """load_places_index, dropping cached answers when places.json has changed"""
+    global _cached_index
+    index = load_places_index()
+    if index is not _cached_index:
+        query_cache.clear()
+        _cached_index = index
+    return index
+
+
+async def _embed_or_none(query: str):
+    # If the embedding call fails just answer uncached
+    try:
+        return await asyncio.to_thread(embed_query, query)
+    except Exception:
+        return None
+
+
+async def _cache_answer(query: str, result: Dict[str, Any], cache_key: tuple, index):
+    """Embed and cache an answer after the response has gone out"""
+    query_vector = await _embed_or_none(query)
+    # Skip it if places.json changed (and the cache was cleared) meanwhile
+    if query_vector is not None and index is _cached_index:
+        query_cache.put(query_vector, result, cache_key)
+
 
 @app.api_route("/", methods=["GET", "HEAD"])
 async def root() -> Dict[str, Any]:
@@ -33,8 +92,10 @@ async def root() -> Dict[str, Any]:
             "query": "POST /api/query",
             "suggest": "POST /api/suggest",
             "suggest_simple": "GET /api/suggest-simple?query=...",
+            "suggest_stream": "GET /api/suggest-stream?query=...",
             "health": "GET /health",
-            "stats": "GET /api/stats"
+            "stats": "GET /api/stats",
+            "reload": "POST /api/reload (admin)"
         },
         "example_queries": [
             "top 10 spots in Rangamati",
@@ -56,7 +117,7 @@ async def health_check() -> Dict[str, Any]:
 
 # Unified endpoint for frontend chat (AI + RAG)
 @app.post("/api/query")
-async def query_places(payload: Dict[str, Any]) -> JSONResponse:
+async def query_places(payload: Dict[str, Any], background_tasks: BackgroundTasks) -> ORJSONResponse:
     """
     Returns both RAG suggestions and AI fallback response.
     Frontend should display ai_message and suggestions.
@@ -66,21 +127,39 @@ async def query_places(payload: Dict[str, Any]) -> JSONResponse:
         if not query:
             raise HTTPException(status_code=400, detail="Query is required.")
 
-        # Load data and extract info
-        places = load_places_data()
+        places = _places_index()
         location_info = extract_location_info(query)
-        ranked_places = filter_and_rank_places(places, location_info)
-
-        # AI-friendly response
-        response_text = generate_friendly_response(query, ranked_places[:10], location_info)
-
-        return JSONResponse({
-            "success": True,
-            "query": query,
+        cache_key = (location_info["location"], location_info["type"], location_info["count"])
+
+        # Serve near-duplicate questions about the same location without another
+        # LLM call; only embed when there is a cached answer it could match
+        query_vector = None
+        if cache_key in query_cache:
+            query_vector = await _embed_or_none(query)
+            cached = query_cache.get(query_vector, cache_key) if query_vector is not None else None
+            if cached is not None:
+                return ORJSONResponse({"success": True, "query": query, **cached})
+
+        ranked_places = filter_and_rank_places(places, location_info, top_k=10)
+
+        # AI-friendly response; if Gemini is down still return the suggestions
+        try:
+            response_text = await generate_friendly_response(query, ranked_places[:10], location_info)
+        except GoogleAPIError:
+            response_text = None
+
+        result = {
             "type": location_info.get("type", "unknown"),
             "ai_message": response_text,
             "suggestions": ranked_places[:10]  # top 10 spots
-        })
+        }
+        if response_text is not None:
+            if query_vector is not None:
+                query_cache.put(query_vector, result, cache_key)
+            else:
+                background_tasks.add_task(_cache_answer, query, result, cache_key, places)
+
+        return ORJSONResponse({"success": True, "query": query, **result})
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -90,7 +169,7 @@ async def query_places(payload: Dict[str, Any]) -> JSONResponse:
 @app.post("/api/suggest", response_model=TourResponse)
 async def suggest_places(query_data: TourQuery) -> Dict[str, Any]:
     try:
-        result = get_tour_suggestions(query=query_data.query, top_k=query_data.top_k or 20)
+        result = await get_tour_suggestions(query=query_data.query, top_k=query_data.top_k or 20)
         if not result["success"]:
             raise HTTPException(status_code=404, detail=result.get("error", "No results found"))
         return result
@@ -104,7 +183,7 @@ async def suggest_places(query_data: TourQuery) -> Dict[str, Any]:
 @app.get("/api/suggest-simple")
 async def suggest_places_simple(query: str) -> Dict[str, Any]:
     try:
-        result = get_tour_suggestions(query=query, top_k=20)
+        result = await get_tour_suggestions(query=query, top_k=20)
         # Mark fallback type if no RAG suggestions
         if result.get("success") and len(result.get("suggestions", [])) == 0:
             result["type"] = "ai_fallback"
@@ -115,31 +194,40 @@ async def suggest_places_simple(query: str) -> Dict[str, Any]:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# Streaming variant: suggestions first, then the AI message as server-sent events
+@app.get("/api/suggest-stream")
+async def suggest_places_stream(query: str) -> StreamingResponse:
+    async def events():
+        async for event, data in stream_tour_suggestions(query=query, top_k=20):
+            yield b"event: " + event.encode() + b"\ndata: " + orjson.dumps(data) + b"\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
 # Endpoint to get dataset statistics
 @app.get("/api/stats")
 async def get_stats() -> Dict[str, Any]:
     try:
-        places = load_places_data()
-        division_counts = {}
-        category_counts = {}
-
-        for place in places:
-            division = place.get("division", "Unknown")
-            division_counts[division] = division_counts.get(division, 0) + 1
-            categories = place.get("categories", ["General"])
-            for c in categories:
-                category_counts[c] = category_counts.get(c, 0) + 1
-
-        return {
-            "success": True,
-            "data": {
-                "total_places": len(places),
-                "by_division": division_counts,
-                "by_category": category_counts,
-                "places_with_images": sum(1 for p in places if p.get("image")),
-                "places_with_descriptions": sum(1 for p in places if p.get("description"))
-            }
-        }
+        # Precomputed when places.json is loaded; refreshed by /api/reload
+        return {"success": True, "data": load_places_index().stats}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def _require_admin(token: str):
+    """403 unless token matches settings.ADMIN_TOKEN (admin endpoints are off when it's unset)"""
+    if not settings.ADMIN_TOKEN or not secrets.compare_digest(token.encode(), settings.ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Admin token required.")
+
+
+# Admin endpoint to pick up a regenerated places.json without a restart
+@app.post("/api/reload")
+async def reload_data(x_admin_token: str = Header("")) -> Dict[str, Any]:
+    _require_admin(x_admin_token)
+    try:
+        total = reload_places_data()
+        query_cache.clear()
+        return {"success": True, "data": {"total_places": total}}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -4,7 +4,7 @@ from typing import List, Optional, Dict, Any
 class TourQuery(BaseModel):
     """Request model for tour suggestions"""
     query: str = Field(..., description="User's query about tourist spots")
-    top_k: Optional[int] = Field(20, description="Number of places to retrieve")
+    top_k: Optional[int] = Field(20, ge=1, description="Number of places to retrieve")
     
     class Config:
         json_schema_extra = {
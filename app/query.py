@@ -1,31 +1,61 @@
-import json
+import orjson
+import asyncio
 import faiss
+from pathlib import Path
 import numpy as np
 import google.generativeai as genai
-from app.config import settings, EMBED_MODEL, LLM_MODEL, FAISS_INDEX_PATH, TOP_K
+from app.config import settings, EMBED_MODEL, LLM_MODEL, FAISS_INDEX_PATH, TOP_K, HNSW_EF_SEARCH
+from app.semantic_cache import SemanticCache
+from app.rag import extract_location_info
 
 # Configure Gemini
 genai.configure(api_key=settings.GEMINI_API_KEY)
 
-# Load FAISS and mapping
-index = faiss.read_index(FAISS_INDEX_PATH)
-with open("../data/place_mapping.json", "r", encoding="utf-8") as f:
-    places = json.load(f)
+# Load FAISS and mapping. The index file is memory-mapped read-only, so every
+# Uvicorn worker shares one copy through the page cache instead of its own heap copy
+# (IO_FLAG_MMAP covers IVF lists, IO_FLAG_MMAP_IFC flat/HNSW codes).
+index = faiss.read_index(
+    FAISS_INDEX_PATH,
+    faiss.IO_FLAG_MMAP | faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY
+)
+if isinstance(index, faiss.IndexHNSW):
+    index.hnsw.efSearch = HNSW_EF_SEARCH
+# embed_faiss.py builds an inner-product index over unit vectors; an older flat
+# L2 index holds raw embeddings, so queries are only normalised for the former
+NORMALIZE_QUERIES = index.metric_type == faiss.METRIC_INNER_PRODUCT
+places = orjson.loads(Path("../data/place_mapping.json").read_bytes())
 
-def query_ai(user_query: str):
+# Reused 1 x dim search buffer. It is filled and searched with no await in
+# between, so concurrent queries on the event loop never interleave inside it.
+_QBUF = np.empty((1, index.d), dtype=np.float32)
+
+# Answers for previously seen (or near-duplicate) queries, partitioned by the
+# parsed (location, type, count) so "dhaka" never answers "khulna"
+answer_cache = SemanticCache()
+
+async def query_ai(user_query: str):
     """Return JSON response with AI-generated text + top recommended tourist spots"""
 
-    # Step 1: Embed user query
-    query_embed = genai.embed_content(
+    # Step 1: Embed user query (SDK calls block, so run them off the event loop)
+    query_embed = (await asyncio.to_thread(
+        genai.embed_content,
         model=EMBED_MODEL,
         content=user_query,
         task_type="retrieval_query"
-    )["embedding"]
-    query_vector = np.array(query_embed, dtype="float32").reshape(1, -1)
+    ))["embedding"]
+    np.copyto(_QBUF[0], query_embed)
+
+    location_info = extract_location_info(user_query)
+    cache_key = (location_info["location"], location_info["type"], location_info["count"])
+    cached = answer_cache.get(_QBUF, cache_key)
+    if cached is not None:
+        return {"query": user_query, **cached}
 
     # Step 2: Retrieve most similar places
-    D, I = index.search(query_vector, TOP_K)
-    retrieved = [places[i] for i in I[0]]
+    if NORMALIZE_QUERIES:
+        faiss.normalize_L2(_QBUF)
+    D, I = index.search(_QBUF, TOP_K)
+    retrieved = [places[i] for i in I[0] if i >= 0]
 
     # Step 3: Create context
     context = "\n\n".join([
@@ -43,13 +73,12 @@ def query_ai(user_query: str):
     )
 
     model = genai.GenerativeModel(LLM_MODEL)
-    response = model.generate_content(prompt)
+    response = await asyncio.to_thread(model.generate_content, prompt)
 
     ai_answer = response.text.strip()
 
     # Step 5: Return clean JSON
-    return {
-        "query": user_query,
+    result = {
         "answer": ai_answer,
         "spots": [
             {
@@ -61,6 +90,9 @@ def query_ai(user_query: str):
             for p in retrieved
         ]
     }
+    # _QBUF may belong to another query by now, so cache under the raw embedding
+    answer_cache.put(query_embed, result, cache_key)
+    return {"query": user_query, **result}
 
 # --- CLI test mode ---
 if __name__ == "__main__":
@@ -69,7 +101,7 @@ if __name__ == "__main__":
         q = input("\nAsk about a place or division in Bangladesh: ")
         if q.lower() in ["exit", "quit"]:
             break
-        result = query_ai(q)
+        result = asyncio.run(query_ai(q))
         print("\n🤖 AI Guide Says:\n")
         print(result["answer"])
         print("\n📸 Recommended Spots:\n")
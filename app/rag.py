@@ -1,21 +1,264 @@
 # app/rag.py - UPDATED VERSION WITH GENERAL QUERY FIX
 
 import os
-import json
-from typing import List, Dict, Any
+import re
+import asyncio
+import pickle
+import logging
+import time
+import hashlib
+import threading
+import orjson
+from collections import OrderedDict
+from functools import lru_cache
+from pathlib import Path
+from typing import List, Dict, Any, NamedTuple, Optional, Tuple, AsyncIterator
+import numpy as np
+import ahocorasick
 import google.generativeai as genai
-from app.config import settings
+from google.api_core import exceptions as google_exceptions
+from app.config import settings, RAG_CACHE_SIZE, GEMINI_MAX_ATTEMPTS
+from app.utils import GEMINI_SEMAPHORE
+
+logger = logging.getLogger(__name__)
 
 # Configure Gemini API
 genai.configure(api_key=settings.GEMINI_API_KEY)
 model = genai.GenerativeModel("gemini-2.0-flash")
 
+# Fixed tour-guide persona, sent as the model's system instruction so each
+# request only carries the query and the matched spots
+GUIDE_INSTRUCTION = """You are "Rahim", a friendly and enthusiastic Bangladeshi tour guide...
+Write a warm, conversational response (3-4 short paragraphs)..."""
+guide_model = genai.GenerativeModel("gemini-2.0-flash", system_instruction=GUIDE_INSTRUCTION)
+
+# Per-request part of the tour-guide prompt
+_PROMPT_TMPL = """User asked: "{query}"
+Tourist spots in/around {location}:{spots}
+"""
+
+
+PLACES_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'places.json')
+# Built PlacesIndex saved next to places.json, so a restart skips the rebuild
+INDEX_CACHE_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'places.index.pkl')
+INDEX_CACHE_VERSION = 2  # bump when PlacesIndex or how it is built changes
+
+# Divisions (query keywords per division)
+DIVISION_KEYWORDS = {
+    'dhaka': ['dhaka'],
+    'chittagong': ['chittagong', 'chattogram', 'ctg'],
+    'khulna': ['khulna'],
+    'sylhet': ['sylhet'],
+    'barisal': ['barisal', 'barishal'],
+    'rajshahi': ['rajshahi'],
+    'rangpur': ['rangpur'],
+    'mymensingh': ['mymensingh']
+}
+
+# Popular specific locations (query keywords per place)
+SPECIFIC_PLACE_KEYWORDS = {
+    'rangamati': ['rangamati'],
+    'cox\'s bazar': ['cox', 'coxs bazar', "cox's bazar", 'coxsbazar'],
+    'sundarbans': ['sundarban', 'sundarbans'],
+    'bandarban': ['bandarban'],
+    'sajek': ['sajek'],
+    'saint martin': ['saint martin', 'st martin'],
+    'kuakata': ['kuakata'],
+    'ratargul': ['ratargul'],
+    'srimangal': ['srimangal', 'sreemangal'],
+    'paharpur': ['paharpur'],
+    'mahasthangarh': ['mahasthangarh'],
+    'jaflong': ['jaflong'],
+    'tanguar haor': ['tanguar', 'tanguar haor']
+}
+
+# Famous tourist spots used to rank general (whole-country) queries
+FAMOUS_KEYWORDS = [
+    'cox', 'sundarban', 'saint martin', 'rangamati', 
+    'bandarban', 'sajek', 'kuakata', 'paharpur', 'ratargul', 'srimangal'
+]
+
+# Popular destinations suggested when a query matches nothing in the dataset
+POPULAR_KEYWORDS = [
+    "cox", "sundarban", "kuakata", "bandarban",
+    "rangamati", "sajek", "sylhet", "saint martin"
+]
+
+# Best relevance score a match needs before the LLM is asked to write about it;
+# weaker matches get LOW_CONFIDENCE_MESSAGE instead
+MIN_LLM_SCORE = 25
+LOW_CONFIDENCE_MESSAGE = (
+    "I couldn't find a close match for \"{query}\", but these places might interest you: "
+    "{spots}. Try asking about a division or a well-known spot for more detailed tips!"
+)
+
+# Query words that ask about the whole country, matched as whole words
+_GENERAL_KEYWORDS = frozenset({'bangladesh', 'bangladeshi', 'bd', 'country', 'nation'})
+WORD_RE = re.compile(r"[a-z]+")
+
+# Requested number of spots: "top 5" or "5 spot(s)" / "5 place(s)"
+COUNT_RE = re.compile(r'\b(?:top\s+(\d+)|(\d+)\s+(?:spot|place)s?)\b')
+
+# Every keyword a query's location is detected by or scored against, matched in
+# one Aho-Corasick pass per text (each query, and every place when the index is built)
+KEYWORDS = list(dict.fromkeys(
+    [kw for kws in DIVISION_KEYWORDS.values() for kw in kws]
+    + [kw for place, kws in SPECIFIC_PLACE_KEYWORDS.items() for kw in [place] + kws]
+    + FAMOUS_KEYWORDS
+))
+KEYWORD_IDS = {kw: i for i, kw in enumerate(KEYWORDS)}
+_AUTOMATON = ahocorasick.Automaton()
+for _kw, _kw_id in KEYWORD_IDS.items():
+    _AUTOMATON.add_word(_kw, _kw_id)
+_AUTOMATON.make_automaton()
+
+# (location, type, query keyword ids, search keywords) in detection priority order
+_LOCATIONS = [
+    (place, 'specific', frozenset(KEYWORD_IDS[kw] for kw in kws), [place] + kws)
+    for place, kws in SPECIFIC_PLACE_KEYWORDS.items()
+] + [
+    (division, 'division', frozenset(KEYWORD_IDS[kw] for kw in kws), kws)
+    for division, kws in DIVISION_KEYWORDS.items()
+]
+
+
+def _keyword_hits(column: List[str]) -> np.ndarray:
+    """Bool (n_texts, n_keywords) matrix: which KEYWORDS occur in each text"""
+    hits = np.zeros((len(column), len(KEYWORDS)), dtype=bool)
+    for row, text in enumerate(column):
+        for _, kw_id in _AUTOMATON.iter(text):
+            hits[row, kw_id] = True
+    return hits
+
+
+class PlacesIndex(NamedTuple):
+    """Parsed places plus column arrays (one row per place) used for ranking"""
+    places: List[Dict]
+    name_hits: np.ndarray            # bool, (n_places, len(KEYWORDS)) keyword-in-field
+    division_hits: np.ndarray
+    description_hits: np.ndarray
+    url_hits: np.ndarray
+    name_keyword_ids: np.ndarray     # KEYWORDS id the whole field equals, else -1
+    division_keyword_ids: np.ndarray
+    description_lengths: np.ndarray
+    has_image: np.ndarray
+    postings: Dict[str, np.ndarray]  # keyword -> indices of places containing it in any field
+    stats: Dict[str, Any]            # dataset aggregates served by /api/stats
+
+
+def _lowercased(places: List[Dict], key: str) -> List[str]:
+    return [(p.get(key) or '').lower() for p in places]
+
+
+def _load_index_cache(key: tuple) -> Optional[PlacesIndex]:
+    """The pickled index from a previous run, if it was built from the same inputs"""
+    if not os.path.exists(INDEX_CACHE_PATH):
+        return None
+    try:
+        with open(INDEX_CACHE_PATH, 'rb') as f:
+            cached_key, index = pickle.load(f)
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable index cache {INDEX_CACHE_PATH}: {e}")
+        return None
+    return index if cached_key == key else None
+
+
+def _save_index_cache(key: tuple, index: PlacesIndex):
+    # Write then rename, so a concurrent reader never sees a partial file.
+    # The cache is only an optimisation: a failed write must not fail the load.
+    tmp_path = Path(f"{INDEX_CACHE_PATH}.{os.getpid()}.tmp")
+    try:
+        with open(tmp_path, 'wb') as f:
+            pickle.dump((key, index), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, INDEX_CACHE_PATH)
+    except Exception as e:
+        logger.warning(f"Could not write index cache {INDEX_CACHE_PATH}: {e}")
+        try:
+            tmp_path.unlink(missing_ok=True)
+        except OSError:
+            pass
+
+
+@lru_cache(maxsize=1)
+def _build_places_index(mtime_ns: int) -> PlacesIndex:
+    """Places index for this places.json version, from the on-disk cache or built fresh"""
+    # Keyed on the keyword vocabulary too: the hit matrices' columns are KEYWORDS
+    key = (INDEX_CACHE_VERSION, mtime_ns, tuple(KEYWORDS))
+    index = _load_index_cache(key)
+    if index is None:
+        index = _compute_places_index()
+        _save_index_cache(key, index)
+    return index
+
+
+def _compute_places_index() -> PlacesIndex:
+    """Parse places.json and precompute the fields used for ranking"""
+    places = orjson.loads(Path(PLACES_PATH).read_bytes())
+
+    place_categories = [p.get('categories', ['General']) for p in places]
+    categories = list(dict.fromkeys(c for cats in place_categories for c in cats))
+    column = {c: j for j, c in enumerate(categories)}
+    category_mask = np.zeros((len(places), len(categories)), dtype=bool)
+    for i, cats in enumerate(place_categories):
+        category_mask[i, [column[c] for c in cats]] = True
+
+    description_lengths = np.array([len(p.get('description') or '') for p in places], dtype=int)
+    has_image = np.array([bool(p.get('image')) for p in places], dtype=bool)
+    division_labels = [p.get('division') or 'Unknown' for p in places]
+
+    # Places don't change at runtime, so the /api/stats aggregates are computed once here
+    divisions, division_totals = np.unique(division_labels, return_counts=True)
+    stats = {
+        "total_places": len(places),
+        "by_division": dict(zip(divisions.tolist(), division_totals.tolist())),
+        "by_category": dict(zip(categories, category_mask.sum(axis=0).tolist())),
+        "places_with_images": int(has_image.sum()),
+        "places_with_descriptions": int((description_lengths > 0).sum())
+    }
+
+    # Lowercased texts are only needed to find the keywords; keywords outside
+    # KEYWORDS are matched against the place dicts on demand (_field_contains)
+    names = _lowercased(places, 'name')
+    divisions = _lowercased(places, 'division')
+
+    name_hits = _keyword_hits(names)
+    division_hits = _keyword_hits(divisions)
+    description_hits = _keyword_hits(_lowercased(places, 'description'))
+    url_hits = _keyword_hits(_lowercased(places, 'url'))
+    name_keyword_ids = np.array([KEYWORD_IDS.get(n, -1) for n in names], dtype=np.intp)
+    division_keyword_ids = np.array([KEYWORD_IDS.get(d, -1) for d in divisions], dtype=np.intp)
+    any_hits = name_hits | division_hits | description_hits | url_hits
+    postings = {kw: np.flatnonzero(any_hits[:, kw_id]) for kw, kw_id in KEYWORD_IDS.items()}
+
+    return PlacesIndex(
+        places=places,
+        name_hits=name_hits,
+        division_hits=division_hits,
+        description_hits=description_hits,
+        url_hits=url_hits,
+        name_keyword_ids=name_keyword_ids,
+        division_keyword_ids=division_keyword_ids,
+        description_lengths=description_lengths,
+        has_image=has_image,
+        postings=postings,
+        stats=stats,
+    )
+
+
+def load_places_index() -> PlacesIndex:
+    """Cached places index; a rewritten places.json (new mtime) is picked up on the next call"""
+    return _build_places_index(os.stat(PLACES_PATH).st_mtime_ns)
+
 
 def load_places_data() -> List[Dict]:
-    """Load the places.json file"""
-    places_path = os.path.join(os.path.dirname(__file__), '..', 'data', 'places.json')
-    with open(places_path, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    """Load the places.json file (cached after the first call)"""
+    return load_places_index().places
+
+
+def reload_places_data() -> int:
+    """Drop the cached places and read places.json again"""
+    _build_places_index.cache_clear()
+    return len(load_places_index().places)
 
 
 def extract_location_info(query: str) -> Dict[str, Any]:
@@ -24,66 +267,27 @@ def extract_location_info(query: str) -> Dict[str, Any]:
     """
     query_lower = query.lower()
     
-    # Divisions
-    divisions = {
-        'dhaka': ['dhaka'],
-        'chittagong': ['chittagong', 'chattogram', 'ctg'],
-        'khulna': ['khulna'],
-        'sylhet': ['sylhet'],
-        'barisal': ['barisal', 'barishal'],
-        'rajshahi': ['rajshahi'],
-        'rangpur': ['rangpur'],
-        'mymensingh': ['mymensingh']
-    }
-    
-    # Popular specific locations
-    specific_places = {
-        'rangamati': ['rangamati'],
-        'cox\'s bazar': ['cox', 'coxs bazar', "cox's bazar", 'coxsbazar'],
-        'sundarbans': ['sundarban', 'sundarbans'],
-        'bandarban': ['bandarban'],
-        'sajek': ['sajek'],
-        'saint martin': ['saint martin', 'st martin'],
-        'kuakata': ['kuakata'],
-        'ratargul': ['ratargul'],
-        'srimangal': ['srimangal', 'sreemangal'],
-        'paharpur': ['paharpur'],
-        'mahasthangarh': ['mahasthangarh'],
-        'jaflong': ['jaflong'],
-        'tanguar haor': ['tanguar', 'tanguar haor']
-    }
-    
-    # Extract count
+    # Extract count ("top 5", "5 spots", "3 places"), 1-50
     count = 10
-    for num in range(1, 51):
-        if f'top {num}' in query_lower or f'{num} spot' in query_lower or f'{num} place' in query_lower:
-            count = num
-            break
-    
-    # Check for specific places first (higher priority)
-    for place, keywords in specific_places.items():
-        for keyword in keywords:
-            if keyword in query_lower:
-                return {
-                    'location': place,
-                    'type': 'specific',
-                    'count': count,
-                    'search_keywords': [place] + keywords
-                }
+    m = COUNT_RE.search(query_lower)
+    if m and 1 <= int(m.group(1) or m.group(2)) <= 50:
+        count = int(m.group(1) or m.group(2))
     
-    # Check for divisions
-    for division, keywords in divisions.items():
-        for keyword in keywords:
-            if keyword in query_lower:
-                return {
-                    'location': division,
-                    'type': 'division',
-                    'count': count,
-                    'search_keywords': keywords
-                }
+    # One automaton pass finds every known keyword in the query; locations are
+    # then tried in table order, specific places first (higher priority)
+    found = {kw_id for _, kw_id in _AUTOMATON.iter(query_lower)}
+    for location, loc_type, kw_ids, search_keywords in _LOCATIONS:
+        if not found.isdisjoint(kw_ids):
+            return {
+                'location': location,
+                'type': loc_type,
+                'count': count,
+                'search_keywords': list(search_keywords)
+            }
     
-    # Check for general Bangladesh
-    if any(word in query_lower for word in ['bangladesh', 'bd', 'country', 'nation']):
+    # Check for general Bangladesh (whole words: "abdul" or "destination" don't count)
+    tokens = frozenset(WORD_RE.findall(query_lower))
+    if _GENERAL_KEYWORDS & tokens:
         return {
             'location': 'bangladesh',
             'type': 'general',
@@ -100,155 +304,279 @@ def extract_location_info(query: str) -> Dict[str, Any]:
     }
 
 
-def calculate_relevance_score(place: Dict, location_info: Dict) -> float:
+def _field_contains(places: List[Dict], key: str, keyword: str) -> np.ndarray:
+    """Bool mask of `keyword in place[key].lower()`, for keywords outside KEYWORDS"""
+    return np.fromiter((keyword in text for text in _lowercased(places, key)), dtype=bool, count=len(places))
+
+
+def _keyword_in(places: List[Dict], key: str, hits: np.ndarray, keyword: str) -> np.ndarray:
+    """Bool mask of places whose field contains keyword, precomputed for KEYWORDS"""
+    kw_id = KEYWORD_IDS.get(keyword)
+    if kw_id is None:
+        return _field_contains(places, key, keyword)
+    return hits[:, kw_id]
+
+
+def _candidate_ids(index: PlacesIndex, location_info: Dict) -> np.ndarray:
     """
-    Calculate how relevant a place is to the query
-    Returns a score from 0-100
+    Indices of the places that can score at all: the union of the posting lists
+    of the keywords the query is scored on (every place if one isn't indexed)
     """
-    score = 0.0
+    location_type = location_info['type']
+    if location_type == 'general':
+        keywords = FAMOUS_KEYWORDS
+    elif location_type in ('specific', 'division'):
+        location = location_info['location'].lower()
+        keywords = [kw.lower() for kw in location_info.get('search_keywords', [location])]
+    else:
+        return np.array([], dtype=np.intp)  # unknown queries never score
     
-    place_name = (place.get('name') or '').lower()
-    place_division = (place.get('division') or '').lower()
-    place_desc = (place.get('description') or '').lower()
-    place_url = (place.get('url') or '').lower()
+    postings = []
+    for keyword in keywords:
+        if keyword not in index.postings:
+            return np.arange(len(index.places))
+        postings.append(index.postings[keyword])
+    return np.unique(np.concatenate(postings)) if postings else np.array([], dtype=np.intp)
+
+
+def _select_rows(index: PlacesIndex, ids: np.ndarray) -> PlacesIndex:
+    """The same index restricted to the given places (dataset-wide fields unchanged)"""
+    return index._replace(
+        places=[index.places[i] for i in ids],
+        **{field: getattr(index, field)[ids] for field in (
+            'name_hits', 'division_hits', 'description_hits', 'url_hits',
+            'name_keyword_ids', 'division_keyword_ids',
+            'description_lengths', 'has_image',
+        )}
+    )
+
+
+# Per location type: the field an exact keyword match scores highest in, that
+# exact-match score, then the score of a keyword occurring in each field
+FIELD_WEIGHTS = {
+    'specific': ('names', 50, {'names': 30, 'descriptions': 15, 'urls': 10, 'divisions': 5}),
+    'division': ('divisions', 40, {'divisions': 25, 'descriptions': 15, 'urls': 10, 'names': 5}),
+}
+_FIELD_KEYS = {'names': 'name', 'divisions': 'division', 'descriptions': 'description', 'urls': 'url'}
+_FIELD_HITS = {'names': 'name_hits', 'divisions': 'division_hits',
+               'descriptions': 'description_hits', 'urls': 'url_hits'}
+_FIELD_KEYWORD_IDS = {'names': 'name_keyword_ids', 'divisions': 'division_keyword_ids'}
+
+
+def _keyword_counts(keywords: List[str]) -> Optional[np.ndarray]:
+    """
+    How many times each KEYWORDS entry occurs in keywords, plus a trailing 0
+    picked up by the -1 (no keyword) ids; None if a keyword isn't indexed
+    """
+    counts = np.zeros(len(KEYWORDS) + 1)
+    for keyword in keywords:
+        kw_id = KEYWORD_IDS.get(keyword)
+        if kw_id is None:
+            return None
+        counts[kw_id] += 1
+    return counts
+
+
+def calculate_relevance_scores(index: PlacesIndex, location_info: Dict) -> np.ndarray:
+    """
+    Calculate how relevant every place in the index is to the query
+    Returns an array of scores from 0-100, aligned with index.places
+    """
+    scores = np.zeros(len(index.places))
     
     location = location_info['location'].lower()
     location_type = location_info['type']
     search_keywords = location_info.get('search_keywords', [location])
     
-    if location_type == 'specific':
-        for keyword in search_keywords:
-            keyword_lower = keyword.lower()
-            if keyword_lower == place_name:
-                score += 50
-            elif keyword_lower in place_name:
-                score += 30
-            if keyword_lower in place_desc:
-                score += 15
-            if keyword_lower in place_url:
-                score += 10
-            if keyword_lower in place_division:
-                score += 5
-    
-    elif location_type == 'division':
-        for keyword in search_keywords:
-            keyword_lower = keyword.lower()
-            if keyword_lower == place_division:
-                score += 40
-            elif keyword_lower in place_division:
-                score += 25
-            if keyword_lower in place_desc:
-                score += 15
-            if keyword_lower in place_url:
-                score += 10
-            if keyword_lower in place_name:
-                score += 5
+    if location_type in FIELD_WEIGHTS:
+        exact_field, exact_score, weights = FIELD_WEIGHTS[location_type]
+        exact_bonus = exact_score - weights[exact_field]
+        keywords = [kw.lower() for kw in search_keywords]
+        counts = _keyword_counts(keywords)
+        if counts is not None:
+            # Each field's keyword hits times the query's keyword counts, one
+            # matrix-vector product per field
+            for field, weight in weights.items():
+                scores += weight * (getattr(index, _FIELD_HITS[field]) @ counts[:-1])
+            scores += exact_bonus * counts[getattr(index, _FIELD_KEYWORD_IDS[exact_field])]
+        else:
+            for keyword in keywords:
+                for field, weight in weights.items():
+                    scores += weight * _keyword_in(index.places, _FIELD_KEYS[field],
+                                                   getattr(index, _FIELD_HITS[field]), keyword)
+                exact = [text == keyword for text in _lowercased(index.places, _FIELD_KEYS[exact_field])]
+                scores += exact_bonus * np.array(exact, dtype=bool)
     
     elif location_type == 'general':
-        # Include only famous tourist spots
-        famous_keywords = [
-            'cox', 'sundarban', 'saint martin', 'rangamati', 
-            'bandarban', 'sajek', 'kuakata', 'paharpur', 'ratargul', 'srimangal'
-        ]
-        
-        matched = False
-        for keyword in famous_keywords:
-            if keyword in place_name or keyword in place_desc:
-                score += 30
-                matched = True
-                break
+        # Include only famous tourist spots, generic places score 0
+        famous_ids = [KEYWORD_IDS[kw] for kw in FAMOUS_KEYWORDS]
+        famous = (index.name_hits[:, famous_ids] | index.description_hits[:, famous_ids]).any(axis=1)
         
-        if not matched:
-            return 0  # Exclude generic places
-        
-        if place.get('description') and len(place.get('description', '')) > 50:
-            score += 5
-        if place.get('image'):
-            score += 5
+        scores = np.where(
+            famous,
+            30 + 5 * (index.description_lengths > 50) + 5 * index.has_image,
+            0
+        ).astype(float)
     
-    return score
+    return scores
 
 
-def filter_and_rank_places(places: List[Dict], location_info: Dict) -> List[Dict]:
-    scored_places = []
-    for place in places:
-        score = calculate_relevance_score(place, location_info)
-        if score > 5:
-            place_copy = place.copy()
-            place_copy['_relevance_score'] = score
-            scored_places.append(place_copy)
-    
-    scored_places.sort(key=lambda x: x['_relevance_score'], reverse=True)
-    
-    for place in scored_places:
-        place.pop('_relevance_score', None)
-    
-    return scored_places
+def rank_places(index: PlacesIndex, location_info: Dict,
+                top_k: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Indices into index.places of the places scoring above 5, best first
+    (ties keep places.json order), and their scores
+    top_k: only select and sort the best top_k instead of every match
+    """
+    # Only places sharing a keyword with the query are scored
+    ids = _candidate_ids(index, location_info)
+    scores = calculate_relevance_scores(_select_rows(index, ids), location_info)
+    keep = scores > 5
+    matched, scores = ids[keep], scores[keep]
+    # Scores are whole numbers, so this key is unique: higher score first,
+    # then the earlier place wins a tie
+    keys = scores.astype(np.int64) * len(index.places) - matched
+    if top_k is not None and top_k < len(matched):
+        top = np.argpartition(-keys, top_k)[:top_k]
+        matched, scores, keys = matched[top], scores[top], keys[top]
+    order = np.argsort(-keys)
+    return matched[order], scores[order]
+
+
+def filter_and_rank_places(index: PlacesIndex, location_info: Dict,
+                           top_k: Optional[int] = None) -> List[Dict]:
+    """
+    Places scoring above 5, best first (ties keep places.json order)
+    top_k: only select and sort the best top_k instead of every match
+    The dicts are the cached index's own, shared across requests: don't mutate them
+    """
+    ranked, _ = rank_places(index, location_info, top_k)
+    return [index.places[i] for i in ranked]
 
 
-def generate_friendly_response(query: str, spots: List[Dict], location_info: Dict) -> str:
-    location_name = location_info['location'].title()
-    spots_context = ""
+class ResponseCache:
+    """LRU + TTL cache of generated replies, so a repeated question skips the LLM"""
+
+    def __init__(self, ttl: float = settings.RAG_CACHE_TTL, max_entries: int = RAG_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()  # key -> (text, timestamp)
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            text, ts = entry
+            if time.monotonic() - ts > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return text
+
+    def put(self, key: tuple, text: str):
+        with self._lock:
+            self._entries[key] = (text, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+response_cache = ResponseCache()
+
+
+def _friendly_prompt(query: str, spots: List[Dict], location_info: Dict) -> Tuple[str, tuple]:
+    """The tour-guide prompt for the spots, plus its response-cache key"""
+    entries = []
     for i, spot in enumerate(spots[:10], 1):
-        spots_context += f"\n{i}. **{spot['name']}**"
-        if spot.get('division'):
-            spots_context += f" ({spot['division']})"
+        lines = [f"{i}. **{spot['name']}**" + (f" ({spot['division']})" if spot.get('division') else "")]
         if spot.get('description'):
             desc = spot['description'][:200] + "..." if len(spot['description']) > 200 else spot['description']
-            spots_context += f"\n   {desc}"
-        spots_context += "\n"
+            lines.append(f"   {desc}")
+        entries.append("\n".join(lines))
+    spots_context = "".join(f"\n{entry}\n" for entry in entries)
     
-    prompt = f"""You are "Rahim", a friendly and enthusiastic Bangladeshi tour guide...
-User asked: "{query}"
-Tourist spots in/around {location_name}:{spots_context}
-Write a warm, conversational response (3-4 short paragraphs)...
-"""
+    prompt = _PROMPT_TMPL.format(query=query, location=location_info['location'].title(), spots=spots_context)
+    
+    # Same question about the same spots -> same reply; hashing the spot context
+    # keys out entries built from since-edited descriptions
+    key = (
+        query.lower().strip(),
+        location_info['location'],
+        location_info['type'],
+        tuple(spot['name'] for spot in spots[:10]),
+        hashlib.blake2b(spots_context.encode(), digest_size=16).hexdigest(),
+    )
+    return prompt, key
+
+
+# Gemini errors worth retrying: rate limiting (429) and server-side failures (5xx)
+TRANSIENT_ERRORS = (
+    google_exceptions.ResourceExhausted,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.InternalServerError,
+    google_exceptions.DeadlineExceeded,
+)
+
+
+async def _generate(llm: genai.GenerativeModel, prompt: str, **kwargs):
+    """generate_content_async, retried with exponential backoff on transient errors"""
+    for attempt in range(GEMINI_MAX_ATTEMPTS):
+        try:
+            return await llm.generate_content_async(prompt, **kwargs)
+        except TRANSIENT_ERRORS as e:
+            if attempt == GEMINI_MAX_ATTEMPTS - 1:
+                raise
+            delay = min(0.3 * 2 ** attempt, 2)
+            logger.warning(f"Gemini call failed ({e}), retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+
+async def generate_friendly_response(query: str, spots: List[Dict], location_info: Dict) -> str:
+    prompt, key = _friendly_prompt(query, spots, location_info)
+    cached = response_cache.get(key)
+    if cached is not None:
+        return cached
     
-    response = model.generate_content(prompt)
+    async with GEMINI_SEMAPHORE:
+        response = await _generate(guide_model, prompt)
+    response_cache.put(key, response.text)
     return response.text
 
 
-def get_tour_suggestions(query: str, top_k: int = 20) -> Dict[str, Any]:
-    try:
-        places = load_places_data()
-        location_info = extract_location_info(query)
-        ranked_places = filter_and_rank_places(places, location_info)
-
-        # Normal RAG flow
-        if ranked_places:
-            final_spots = ranked_places[:top_k]
-            friendly_text = generate_friendly_response(query, final_spots, location_info)
-            return {
-                "success": True,
-                "query": query,
-                "location": location_info["location"],
-                "type": location_info["type"],
-                "count": len(final_spots),
-                "suggestions": final_spots,
-                "ai_message": friendly_text
-            }
+async def _stream_text(llm: genai.GenerativeModel, prompt: str) -> AsyncIterator[str]:
+    """Text pieces of the reply as Gemini generates them"""
+    # Hold a permit only while opening the stream, so slow SSE clients reading
+    # it can't starve the other Gemini calls
+    async with GEMINI_SEMAPHORE:
+        response = await _generate(llm, prompt, stream=True)
+    async for chunk in response:
+        if chunk.parts:
+            yield chunk.text
 
-        # AI Fallback
-        else:
-            # Step 1: Find nearby / related places from dataset
-            fallback_places = []
-            query_lower = query.lower()
-            for place in places:
-                if (query_lower in (place.get("name") or "").lower() or
-                    query_lower in (place.get("division") or "").lower()):
-                    fallback_places.append(place)
-            if not fallback_places:
-                # If none found, select popular destinations
-                fallback_places = [
-                    p for p in places
-                    if any(k in (p.get("name") or "").lower() for k in [
-                        "cox", "sundarban", "kuakata", "bandarban",
-                        "rangamati", "sajek", "sylhet", "saint martin"
-                    ])
-                ][:top_k]
-
-            # Step 2: Generate AI response with travel tips and mini-itinerary
-            fallback_prompt = f"""
+
+async def stream_friendly_response(query: str, spots: List[Dict], location_info: Dict) -> AsyncIterator[str]:
+    """generate_friendly_response, yielding the reply piece by piece"""
+    prompt, key = _friendly_prompt(query, spots, location_info)
+    cached = response_cache.get(key)
+    if cached is not None:
+        yield cached
+        return
+    
+    pieces = []
+    async for text in _stream_text(guide_model, prompt):
+        pieces.append(text)
+        yield text
+    response_cache.put(key, "".join(pieces))
+
+
+def _fallback_prompt(query: str) -> str:
+    return f"""
 You are "Rahim", a cheerful Bangladeshi tour guide 🇧🇩.
 A user asked: "{query}"
 
@@ -262,17 +590,106 @@ Please provide a warm, friendly response that includes:
 Then mention some famous Bangladeshi destinations as alternatives.
 """
 
-            ai_fallback_response = model.generate_content(fallback_prompt)
 
-            return {
-                "success": True,
-                "query": query,
-                "location": location_info["location"],
-                "type": "ai_fallback",
-                "count": len(fallback_places),
-                "suggestions": fallback_places[:top_k],
-                "ai_message": ai_fallback_response.text if ai_fallback_response else "Sorry, I couldn’t generate a response."
-            }
+def _low_confidence_message(query: str, spots: List[Dict]) -> str:
+    return LOW_CONFIDENCE_MESSAGE.format(query=query, spots=", ".join(spot["name"] for spot in spots[:5]))
+
+
+def _rank_suggestions(query: str, top_k: int) -> Tuple[Dict[str, Any], Dict[str, Any], float]:
+    """
+    The suggestions part of a tour-suggestions result (everything but ai_message);
+    type is "ai_fallback" when nothing in the
+    dataset matched and the related/popular places are suggested instead.
+    Also returns the parsed location info and the best relevance score.
+    """
+    index = load_places_index()
+    places = index.places
+    location_info = extract_location_info(query)
+    ranked, scores = rank_places(index, location_info, top_k)
+
+    # Normal RAG flow
+    if len(ranked):
+        final_spots = [places[i] for i in ranked]
+        return {
+            "success": True,
+            "query": query,
+            "location": location_info["location"],
+            "type": location_info["type"],
+            "count": len(final_spots),
+            "suggestions": final_spots
+        }, location_info, scores[0]
+
+    # AI Fallback: find nearby / related places from dataset
+    query_lower = query.lower()
+    related = _field_contains(places, 'name', query_lower) | _field_contains(places, 'division', query_lower)
+    fallback_places = [places[i] for i in np.flatnonzero(related)]
+    if not fallback_places:
+        # If none found, select popular destinations
+        popular = np.zeros(len(places), dtype=bool)
+        for keyword in POPULAR_KEYWORDS:
+            popular |= _keyword_in(places, 'name', index.name_hits, keyword)
+        fallback_places = [places[i] for i in np.flatnonzero(popular)[:top_k]]
+    return {
+        "success": True,
+        "query": query,
+        "location": location_info["location"],
+        "type": "ai_fallback",
+        "count": len(fallback_places),
+        "suggestions": fallback_places[:top_k]
+    }, location_info, 0.0
+
+
+async def _suggestions_message(query: str, result: Dict[str, Any], location_info: Dict, best_score: float) -> str:
+    if result["type"] == "ai_fallback":
+        # Generate AI response with travel tips and mini-itinerary
+        async with GEMINI_SEMAPHORE:
+            ai_fallback_response = await _generate(model, _fallback_prompt(query))
+        return ai_fallback_response.text if ai_fallback_response else "Sorry, I couldn’t generate a response."
+    if best_score < MIN_LLM_SCORE:
+        # Weak matches only: not worth a Gemini round-trip
+        return _low_confidence_message(query, result["suggestions"])
+    return await generate_friendly_response(query, result["suggestions"], location_info)
+
+
+async def get_tour_suggestions(query: str, top_k: int = 20) -> Dict[str, Any]:
+    try:
+        result, location_info, best_score = _rank_suggestions(query, top_k)
+        try:
+            result["ai_message"] = await _suggestions_message(query, result, location_info, best_score)
+        except google_exceptions.GoogleAPIError as e:
+            # Ranking worked; the client can still show the suggestions
+            logger.warning(f"Gemini call failed, answering without ai_message: {e}")
+            result["ai_message"] = None
+        return result
 
     except Exception as e:
         return {"success": False, "error": str(e)}
+
+
+async def stream_tour_suggestions(query: str, top_k: int = 20) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    """
+    get_tour_suggestions as (event, data) pairs: "suggestions" with the result
+    minus ai_message, then "message" events carrying the reply text as it is
+    generated (a single {"text": None} if Gemini fails), then "done" (or "error")
+    """
+    try:
+        result, location_info, best_score = _rank_suggestions(query, top_k)
+        yield "suggestions", result
+        if result["type"] != "ai_fallback" and best_score < MIN_LLM_SCORE:
+            yield "message", {"text": _low_confidence_message(query, result["suggestions"])}
+        else:
+            if result["type"] == "ai_fallback":
+                pieces = _stream_text(model, _fallback_prompt(query))
+            else:
+                pieces = stream_friendly_response(query, result["suggestions"], location_info)
+            try:
+                async for text in pieces:
+                    yield "message", {"text": text}
+            except google_exceptions.GoogleAPIError as e:
+                # Ranking worked and the suggestions are already out
+                logger.warning(f"Gemini call failed, streaming without ai_message: {e}")
+                yield "message", {"text": None}
+        yield "done", {}
+
+    except Exception as e:
+        yield "error", {"success": False, "error": str(e)}
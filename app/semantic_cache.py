@@ -0,0 +1,105 @@
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+import faiss
+import numpy as np
+import google.generativeai as genai
+from app.config import (
+    settings, EMBED_MODEL,
+    SEMANTIC_CACHE_THRESHOLD, SEMANTIC_CACHE_TTL, SEMANTIC_CACHE_SIZE
+)
+
+# Configure Gemini
+genai.configure(api_key=settings.GEMINI_API_KEY)
+
+
+def embed_query(text: str) -> np.ndarray:
+    """Embed a user query as a (1, dim) float32 vector"""
+    embedding = genai.embed_content(
+        model=EMBED_MODEL,
+        content=text,
+        task_type="retrieval_query"
+    )["embedding"]
+    return np.ascontiguousarray(embedding, dtype=np.float32).reshape(1, -1)
+
+
+class SemanticCache:
+    """
+    LRU + TTL cache of responses keyed by query embedding similarity.
+    A lookup hits when a stored query's cosine similarity to the new one
+    is above the threshold, so near-duplicate questions skip the LLM.
+    Entries can be partitioned by an exact key (e.g. the parsed location):
+    a lookup only considers entries stored under the same key.
+    """
+
+    def __init__(self, threshold: float = SEMANTIC_CACHE_THRESHOLD,
+                 ttl: float = SEMANTIC_CACHE_TTL, max_entries: int = SEMANTIC_CACHE_SIZE):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._indexes: Dict[Hashable, faiss.Index] = {}  # key -> index, created on first put under it
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()  # id -> (value, timestamp, key)
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(vector: np.ndarray) -> np.ndarray:
+        # Copy so the caller's vector is left untouched
+        vector = np.array(vector, dtype=np.float32, order="C").reshape(1, -1)
+        faiss.normalize_L2(vector)
+        return vector
+
+    def _remove(self, entry_id: int):
+        _, _, key = self._entries.pop(entry_id)
+        index = self._indexes[key]
+        index.remove_ids(np.array([entry_id], dtype="int64"))
+        if index.ntotal == 0:
+            del self._indexes[key]
+
+    def _purge_expired(self, key: Hashable):
+        """Drop the entries under key that are past their TTL"""
+        now = time.monotonic()
+        expired = [entry_id for entry_id, (_, ts, entry_key) in self._entries.items()
+                   if entry_key == key and now - ts > self.ttl]
+        for entry_id in expired:
+            self._remove(entry_id)
+
+    def __contains__(self, key: Hashable) -> bool:
+        """Whether any live entry is stored under key (checked before paying for an embedding)"""
+        with self._lock:
+            self._purge_expired(key)
+            return key in self._indexes
+
+    def get(self, vector: np.ndarray, key: Hashable = None) -> Optional[Any]:
+        """Return the cached value for a similar query stored under key, or None"""
+        with self._lock:
+            # Expired entries go first, so they can't shadow a fresh match
+            self._purge_expired(key)
+            index = self._indexes.get(key)
+            if index is None:
+                return None
+            D, I = index.search(self._normalize(vector), 1)
+            entry_id = int(I[0][0])
+            if entry_id < 0 or D[0][0] < self.threshold:
+                return None
+            self._entries.move_to_end(entry_id)
+            return self._entries[entry_id][0]
+
+    def put(self, vector: np.ndarray, value: Any, key: Hashable = None):
+        """Store a value under the query embedding and key, evicting the least recently used"""
+        vector = self._normalize(vector)
+        with self._lock:
+            while len(self._entries) >= self.max_entries:
+                self._remove(next(iter(self._entries)))
+            if key not in self._indexes:
+                self._indexes[key] = faiss.IndexIDMap(faiss.IndexFlatIP(vector.shape[1]))
+            entry_id = self._next_id
+            self._next_id += 1
+            self._indexes[key].add_with_ids(vector, np.array([entry_id], dtype="int64"))
+            self._entries[entry_id] = (value, time.monotonic(), key)
+
+    def clear(self):
+        with self._lock:
+            self._indexes.clear()
+            self._entries.clear()
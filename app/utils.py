@@ -1,20 +1,53 @@
 import os
-import requests
+import asyncio
+from typing import Optional
+import aiohttp
+from app.config import GEMINI_CONCURRENCY
 
-def get_gemini_response(prompt: str):
+GEMINI_URL = "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent"
+
+# Caps in-flight Gemini calls across the app to avoid rate-limit storms
+GEMINI_SEMAPHORE = asyncio.Semaphore(GEMINI_CONCURRENCY)
+
+# Connect / read timeouts (seconds) for Gemini calls
+GEMINI_TIMEOUT = aiohttp.ClientTimeout(sock_connect=3, sock_read=30)
+
+# Shared HTTP session, opened/closed with the app (see main.lifespan). Its pool
+# keeps connections (and TLS sessions, cached DNS) to Gemini alive between calls.
+_SESSION: Optional[aiohttp.ClientSession] = None
+
+
+async def open_session() -> aiohttp.ClientSession:
+    global _SESSION
+    if _SESSION is None or _SESSION.closed:
+        connector = aiohttp.TCPConnector(limit=GEMINI_CONCURRENCY, ttl_dns_cache=300)
+        _SESSION = aiohttp.ClientSession(connector=connector, timeout=GEMINI_TIMEOUT)
+    return _SESSION
+
+
+async def close_session():
+    global _SESSION
+    if _SESSION is not None:
+        await _SESSION.close()
+        _SESSION = None
+
+
+async def get_gemini_response(prompt: str):
     """Calls Gemini API (or fallback logic if offline)."""
     api_key = os.getenv("GEMINI_API_KEY")
     if not api_key:
         return "Gemini API key not configured. Please set GEMINI_API_KEY in .env."
 
     try:
-        response = requests.post(
-            "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent",
-            headers={"Content-Type": "application/json"},
-            params={"key": api_key},
-            json={"contents": [{"parts": [{"text": prompt}]}]}
-        )
-        data = response.json()
+        session = await open_session()
+        async with GEMINI_SEMAPHORE:
+            async with session.post(
+                GEMINI_URL,
+                headers={"Content-Type": "application/json"},
+                params={"key": api_key},
+                json={"contents": [{"parts": [{"text": prompt}]}]}
+            ) as response:
+                data = await response.json()
         return data["candidates"][0]["content"]["parts"][0]["text"]
     except Exception as e:
         return f"(AI Fallback) Could not reach Gemini API. Error: {str(e)}"